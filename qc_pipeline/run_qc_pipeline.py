@@ -2,15 +2,22 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import contextlib
 import csv
 import datetime as dt
+import functools
+import hashlib
+import json
 import os
+import re
 import shutil
+import signal
 import subprocess
 import sys
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
 
 # ----------------------------
@@ -51,42 +58,144 @@ def file_ok(p: Path, min_bytes: int = 1) -> bool:
     return p.exists() and p.is_file() and p.stat().st_size >= min_bytes
 
 
-def run_cmd(
+CACHE_NAME = ".qc_cache.json"
+
+
+def cache_key(inputs: List[Path], extra_args: str = "") -> str:
+    """
+    Fingerprint of a step's inputs (size + mtime, not content) and arguments.
+    """
+    parts = []
+    for p in inputs:
+        try:
+            st = p.stat()
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+        except FileNotFoundError:
+            parts.append("missing")
+    parts.append(extra_args)
+    return hashlib.sha1(":".join(parts).encode("utf-8")).hexdigest()
+
+
+def load_cache(step_dir: Path) -> Dict[str, str]:
+    try:
+        return json.loads((step_dir / CACHE_NAME).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def store_cache(step_dir: Path, entry: str, key: Optional[str]) -> None:
+    """
+    Record key for entry; key=None forgets it (call before rerunning a step,
+    so outputs left half-written by a crash never look up to date).
+    """
+    # read-modify-write with no await in between, so concurrent samples can't race
+    cache = load_cache(step_dir)
+    if key is None:
+        if cache.pop(entry, None) is None:
+            return
+    else:
+        cache[entry] = key
+    (step_dir / CACHE_NAME).write_text(json.dumps(cache, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def outputs_current(outputs: List[Path], step_dir: Path, entry: str, key: str) -> bool:
+    """
+    True if all outputs exist and were produced from inputs/args matching key.
+    """
+    return all(file_ok(p) for p in outputs) and load_cache(step_dir).get(entry) == key
+
+
+@contextlib.contextmanager
+def open_log_fd(path: Path) -> Iterator[int]:
+    """
+    Open a log once as a raw O_APPEND fd. Children write to it directly,
+    and the kernel keeps each write atomic at end-of-file.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        yield fd
+    finally:
+        os.close(fd)
+
+
+def log_write(log_fd: int, text: str) -> None:
+    os.write(log_fd, text.encode("utf-8"))
+
+
+# process groups of running tools; each child leads its own session so
+# ^C reaches it only through us, and we can kill its whole process tree
+ACTIVE_PGIDS: Set[int] = set()
+
+
+def kill_active_children(sig: int = signal.SIGTERM) -> None:
+    for pgid in list(ACTIVE_PGIDS):
+        try:
+            os.killpg(pgid, sig)
+        except ProcessLookupError:
+            pass
+
+
+async def run_cmd_async(
     cmd: List[str],
-    log_path: Path,
+    log_fd: int,
     dry_run: bool = False,
     cwd: Optional[Path] = None,
+    outputs: Sequence[Path] = (),
 ) -> None:
     """
-    Run command, append stdout/stderr to log.
+    Run command asynchronously, stdout/stderr go straight to the log fd.
     Fail fast if command returns non-zero.
+    If the run is cancelled (SIGINT/SIGTERM), the tool's process group is
+    terminated and its partial outputs are removed.
     """
     cmd_str = " ".join([shlex_quote(x) for x in cmd])
-    with log_path.open("a", encoding="utf-8") as log:
-        log.write(f"\n[{now_iso()}] $ {cmd_str}\n")
-        log.flush()
+    log_write(log_fd, f"\n[{now_iso()}] $ {cmd_str}\n")
+
+    if dry_run:
+        log_write(log_fd, "[DRY-RUN] Command not executed.\n")
+        return
+
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=log_fd,
+        stderr=log_fd,
+        cwd=str(cwd) if cwd else None,
+        start_new_session=True,
+    )
+    ACTIVE_PGIDS.add(proc.pid)
+    try:
+        returncode = await proc.wait()
+    except asyncio.CancelledError:
+        # a second ^C while the tool shuts down escalates to SIGKILL; cleanup still runs
+        sig = signal.SIGTERM
+        while True:
+            try:
+                os.killpg(proc.pid, sig)
+            except ProcessLookupError:
+                pass
+            try:
+                await asyncio.shield(proc.wait())
+                break
+            except asyncio.CancelledError:
+                sig = signal.SIGKILL
+        for p in outputs:
+            p.unlink(missing_ok=True)
+        log_write(log_fd, f"[{now_iso()}] INTERRUPTED: {cmd_str}\n")
+        raise
+    finally:
+        ACTIVE_PGIDS.discard(proc.pid)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
 
-        if dry_run:
-            log.write("[DRY-RUN] Command not executed.\n")
-            return
 
-        proc = subprocess.run(
-            cmd,
-            stdout=log,
-            stderr=log,
-            cwd=str(cwd) if cwd else None,
-            check=False,
-            text=True,
-        )
-        if proc.returncode != 0:
-            raise subprocess.CalledProcessError(proc.returncode, cmd)
+_UNSAFE_RE = re.compile(r"[\s\"'()\[\]{}$&;|<>*]")
 
 
 def shlex_quote(s: str) -> str:
     # minimal safe quoting for logs
     if not s:
         return "''"
-    if any(ch.isspace() or ch in "\"'()[]{}$&;|<>*" for ch in s):
+    if _UNSAFE_RE.search(s):
         return "'" + s.replace("'", "'\"'\"'") + "'"
     return s
 
@@ -104,9 +213,12 @@ def which_or_die(tool_name: str, tool_cmd: str) -> str:
     return resolved
 
 
-def get_tool_version(cmd: str, log_path: Path) -> str:
+@functools.lru_cache(maxsize=None)
+def probe_tool_version(cmd: str) -> Tuple[str, str]:
     """
     Best-effort version capture. Not all tools behave consistently.
+    Returns (args used, output) for the first probe that prints something,
+    ("", "") if none do. Cached per cmd; each probe is capped at 2 s.
     """
     candidates = [
         [cmd, "--version"],
@@ -116,15 +228,24 @@ def get_tool_version(cmd: str, log_path: Path) -> str:
     for c in candidates:
         try:
             out = subprocess.run(
-                c, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, check=False
+                c, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, check=False, timeout=2
             ).stdout.strip()
-            if out:
-                with log_path.open("a", encoding="utf-8") as log:
-                    log.write(f"\n[{now_iso()}] VERSION {cmd}: {' '.join(c[1:])}\n{out}\n")
-                return out.splitlines()[0][:200]
-        except Exception:
+        except Exception:  # includes subprocess.TimeoutExpired
             continue
-    return "unknown"
+        if out:
+            return " ".join(c[1:]), out
+    return "", ""
+
+
+def get_tool_version(cmd: str, log_fd: int) -> str:
+    """
+    Version string for the report; full probe output goes to the log.
+    """
+    used, out = probe_tool_version(cmd)
+    if not out:
+        return "unknown"
+    log_write(log_fd, f"\n[{now_iso()}] VERSION {cmd}: {used}\n{out}\n")
+    return out.splitlines()[0][:200]
 
 
 def load_yaml_config(path: Path) -> Dict:
@@ -146,6 +267,24 @@ def load_yaml_config(path: Path) -> Dict:
     return cfg
 
 
+def fastp_extra_args(cfg: Dict) -> Tuple[str, int]:
+    """
+    fastp extra args with the gzip level of the trimmed reads made explicit.
+    fastp defaults to level 4, whose deflate dominates its runtime; level 1
+    is ~2x faster for ~10% bigger files. An explicit -z/--compression in
+    extra_args wins over fastp.compression.
+    """
+    fastp_cfg = cfg.get("fastp", {}) or {}
+    args = str(fastp_cfg.get("extra_args", "")).split()
+    for i, a in enumerate(args):
+        if a in ("-z", "--compression") and i + 1 < len(args):
+            return " ".join(args), int(args[i + 1])
+        if a.startswith("--compression="):
+            return " ".join(args), int(a.split("=", 1)[1])
+    level = int(fastp_cfg.get("compression", 1))
+    return " ".join(args + ["--compression", str(level)]), level
+
+
 def load_samples_tsv(path: Path) -> List[Sample]:
     if not path.exists():
         die(f"Samples file not found: {path}")
@@ -155,67 +294,115 @@ def load_samples_tsv(path: Path) -> List[Sample]:
         required = {"sample", "fq1", "fq2"}
         if not reader.fieldnames or not required.issubset(set(reader.fieldnames)):
             die(f"samples.tsv must have columns: sample, fq1, fq2 (tab-separated). Got: {reader.fieldnames}")
+        seen: Set[str] = set()
         for row in reader:
             name = (row.get("sample") or "").strip()
             fq1 = (row.get("fq1") or "").strip()
             fq2 = (row.get("fq2") or "").strip()
             if not name or not fq1 or not fq2:
                 die(f"Bad row in samples.tsv (missing fields): {row}")
+            if name in seen:
+                die(f"Duplicate sample name in samples.tsv: {name}")
+            seen.add(name)
             samples.append(Sample(name=name, fq1=Path(fq1), fq2=Path(fq2)))
-    # uniqueness
-    seen = set()
-    for s in samples:
-        if s.name in seen:
-            die(f"Duplicate sample name in samples.tsv: {s.name}")
-        seen.add(s.name)
     return samples
 
 
 def validate_inputs(samples: List[Sample]) -> None:
+    # one directory listing per input folder instead of two stat() calls per sample
+    present: Dict[Path, Set[str]] = {}
+    for d in {fq.parent for s in samples for fq in (s.fq1, s.fq2)}:
+        try:
+            with os.scandir(d) as it:
+                present[d] = {e.name for e in it if e.is_file()}
+        except OSError:
+            present[d] = set()
     for s in samples:
-        if not s.fq1.exists():
-            die(f"Missing FASTQ for sample {s.name}: {s.fq1}")
-        if not s.fq2.exists():
-            die(f"Missing FASTQ for sample {s.name}: {s.fq2}")
+        for fq in (s.fq1, s.fq2):
+            if fq.name not in present[fq.parent]:
+                die(f"Missing FASTQ for sample {s.name}: {fq}")
 
 
 # ----------------------------
 # Pipeline steps
 # ----------------------------
-def step_fastqc(
+# FastQC strips these from the input file name, in this order, before adding _fastqc
+FASTQC_SUFFIXES = (".gz", ".bz2", ".txt", ".fastq", ".fq", ".csfastq", ".sam", ".bam")
+
+
+def fastqc_outputs(outdir: Path, fq: Path) -> Tuple[Path, Path]:
+    """Report paths FastQC writes for one input: (zip, html)."""
+    name = fq.name
+    for suffix in FASTQC_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return outdir / f"{name}_fastqc.zip", outdir / f"{name}_fastqc.html"
+
+
+def fastp_outputs(outdir: Path, sample: str) -> Tuple[Path, Path, Path, Path]:
+    sdir = outdir / sample
+    return (
+        sdir / f"{sample}_R1.trim.fq.gz",
+        sdir / f"{sample}_R2.trim.fq.gz",
+        sdir / f"{sample}.fastp.json",
+        sdir / f"{sample}.fastp.html",
+    )
+
+
+async def step_fastqc_batch(
     fastqc_cmd: str,
-    fq1: Path,
-    fq2: Path,
+    fqs: List[Path],
     outdir: Path,
     threads: int,
-    log_path: Path,
+    log_fd: int,
     dry_run: bool,
-) -> Tuple[Path, Path]:
+) -> List[Path]:
     """
-    Run FastQC on a pair of reads.
-    Returns expected .zip outputs.
+    Run FastQC once on many FASTQs (one JVM start, files spread over --threads).
+    Returns expected .zip outputs, in input order.
     """
     ensure_dir(outdir)
 
-    # FastQC naming convention uses input filename stem + _fastqc.zip
-    zip1 = outdir / f"{fq1.name}_fastqc.zip"
-    zip2 = outdir / f"{fq2.name}_fastqc.zip"
-
-    if file_ok(zip1) and file_ok(zip2):
-        return zip1, zip2
-
     cmd = [
         fastqc_cmd,
-        "--threads", str(threads),
+        "--threads", str(max(1, min(threads, len(fqs)))),
         "--outdir", str(outdir),
-        str(fq1),
-        str(fq2),
+    ] + [str(fq) for fq in fqs]
+    reports = [fastqc_outputs(outdir, fq) for fq in fqs]
+    await run_cmd_async(cmd, log_fd=log_fd, dry_run=dry_run, outputs=[p for r in reports for p in r])
+    return [z for z, _ in reports]
+
+
+async def step_decompress(
+    rapidgzip_cmd: str,
+    fq: Path,
+    outdir: Path,
+    threads: int,
+    min_bytes: int,
+    log_fd: int,
+    dry_run: bool,
+) -> Path:
+    """
+    Decompress a large .gz FASTQ with rapidgzip (block-parallel inflate).
+    Returns the path fastp should read: fq itself if small or not gzipped.
+    """
+    if not fq.name.endswith(".gz") or fq.stat().st_size < min_bytes:
+        return fq
+
+    ensure_dir(outdir)
+    out = outdir / fq.name[: -len(".gz")]
+    cmd = [
+        rapidgzip_cmd,
+        "-d", "-f",
+        "-P", str(threads),
+        "-o", str(out),
+        str(fq),
     ]
-    run_cmd(cmd, log_path=log_path, dry_run=dry_run)
-    return zip1, zip2
+    await run_cmd_async(cmd, log_fd=log_fd, dry_run=dry_run, outputs=[out])
+    return out
 
 
-def step_fastp(
+async def step_fastp(
     fastp_cmd: str,
     sample: str,
     fq1: Path,
@@ -223,28 +410,85 @@ def step_fastp(
     outdir: Path,
     threads: int,
     extra_args: str,
-    log_path: Path,
+    log_fd: int,
     dry_run: bool,
-) -> Tuple[Path, Path, Path, Path]:
+    rapidgzip_cmd: Optional[str] = None,
+    rapidgzip_min_bytes: int = 0,
+    decompress_dir: Optional[Path] = None,
+) -> bool:
     """
     Run fastp on paired-end reads.
-    Returns (trim1, trim2, json, html).
+    With rapidgzip_cmd, large .gz inputs are first inflated into decompress_dir.
+    Returns False if the outputs were already up to date and fastp was skipped.
     """
-    sdir = outdir / sample
-    ensure_dir(sdir)
+    ensure_dir(outdir / sample)
+    trim1, trim2, jsonp, htmlp = fastp_outputs(outdir, sample)
+
+    # keyed on the original inputs, so a decompressed copy doesn't invalidate it
+    key = cache_key([fq1, fq2], extra_args)
+    if outputs_current([trim1, trim2, jsonp, htmlp], outdir, sample, key):
+        return False
+
+    if not dry_run:
+        store_cache(outdir, sample, None)
+
+    in1, in2 = fq1, fq2
+    decompress = bool(rapidgzip_cmd) and decompress_dir is not None
+    try:
+        # very large .gz inputs: inflate in parallel first, fastp reads plain FASTQ
+        if decompress:
+            in1, in2 = [
+                await step_decompress(
+                    rapidgzip_cmd=rapidgzip_cmd,
+                    fq=fq,
+                    outdir=decompress_dir,
+                    threads=threads,
+                    min_bytes=rapidgzip_min_bytes,
+                    log_fd=log_fd,
+                    dry_run=dry_run,
+                )
+                for fq in (fq1, fq2)
+            ]
+        await run_fastp(
+            fastp_cmd=fastp_cmd,
+            in1=in1,
+            in2=in2,
+            trim1=trim1,
+            trim2=trim2,
+            jsonp=jsonp,
+            htmlp=htmlp,
+            threads=threads,
+            extra_args=extra_args,
+            log_fd=log_fd,
+            dry_run=dry_run,
+        )
+    finally:
+        # decompressed copies (even partial ones) are only needed while fastp runs
+        if decompress:
+            shutil.rmtree(decompress_dir, ignore_errors=True)
 
-    trim1 = sdir / f"{sample}_R1.trim.fq.gz"
-    trim2 = sdir / f"{sample}_R2.trim.fq.gz"
-    jsonp = sdir / f"{sample}.fastp.json"
-    htmlp = sdir / f"{sample}.fastp.html"
+    if not dry_run:
+        store_cache(outdir, sample, key)
+    return True
 
-    if file_ok(trim1) and file_ok(trim2) and file_ok(jsonp) and file_ok(htmlp):
-        return trim1, trim2, jsonp, htmlp
 
+async def run_fastp(
+    fastp_cmd: str,
+    in1: Path,
+    in2: Path,
+    trim1: Path,
+    trim2: Path,
+    jsonp: Path,
+    htmlp: Path,
+    threads: int,
+    extra_args: str,
+    log_fd: int,
+    dry_run: bool,
+) -> None:
     cmd = [
         fastp_cmd,
-        "--in1", str(fq1),
-        "--in2", str(fq2),
+        "--in1", str(in1),
+        "--in2", str(in2),
         "--out1", str(trim1),
         "--out2", str(trim2),
         "--json", str(jsonp),
@@ -256,21 +500,24 @@ def step_fastp(
     if extra_args.strip():
         cmd.extend(extra_args.strip().split())
 
-    run_cmd(cmd, log_path=log_path, dry_run=dry_run)
-    return trim1, trim2, jsonp, htmlp
+    await run_cmd_async(cmd, log_fd=log_fd, dry_run=dry_run, outputs=[trim1, trim2, jsonp, htmlp])
 
 
-def step_multiqc(
+async def step_multiqc(
     multiqc_cmd: str,
     scan_dir: Path,
     outdir: Path,
-    log_path: Path,
+    modules: List[str],
+    ignore: List[str],
+    log_fd: int,
     dry_run: bool,
 ) -> Path:
+    """
+    Run MultiQC once over scan_dir.
+    modules (-m) and ignore (-x) limit what it searches for and where.
+    """
     ensure_dir(outdir)
     report = outdir / "multiqc_report.html"
-    if file_ok(report):
-        return report
 
     cmd = [
         multiqc_cmd,
@@ -278,10 +525,255 @@ def step_multiqc(
         "--outdir", str(outdir),
         "--force",
     ]
-    run_cmd(cmd, log_path=log_path, dry_run=dry_run)
+    for m in modules:
+        cmd.extend(["-m", m])
+    for pat in ignore:
+        cmd.extend(["-x", pat])
+    await run_cmd_async(cmd, log_fd=log_fd, dry_run=dry_run, outputs=[report])
     return report
 
 
+async def fastqc_phase(
+    step: str,
+    fastqc_cmd: str,
+    pairs: List[Tuple[str, Path, Path]],
+    outdir: Path,
+    threads: int,
+    log_fd: int,
+    dry_run: bool,
+) -> List[StepResult]:
+    """
+    FastQC for all (sample, fq1, fq2) pairs in a single batch.
+    Up-to-date samples are skipped; the rest are checked one by one afterwards.
+    """
+    results: List[StepResult] = []
+    pending = []
+    for name, fq1, fq2 in pairs:
+        reports = [*fastqc_outputs(outdir, fq1), *fastqc_outputs(outdir, fq2)]  # zip, html, zip, html
+        zips = reports[::2]
+        key = cache_key([fq1, fq2])
+        if outputs_current(zips, outdir, fq1.name, key):
+            results.append(StepResult(name, step, "SKIP", "outputs up to date"))
+        else:
+            pending.append((name, fq1, fq2, zips, key, reports))
+
+    if not pending:
+        return results
+
+    if not dry_run:
+        # stale outputs must not pass the post-check below (html goes with its zip)
+        for _, fq1, _, _, _, reports in pending:
+            store_cache(outdir, fq1.name, None)
+            for p in reports:
+                p.unlink(missing_ok=True)
+
+    error = ""
+    try:
+        await step_fastqc_batch(
+            fastqc_cmd=fastqc_cmd,
+            fqs=[fq for _, fq1, fq2, _, _, _ in pending for fq in (fq1, fq2)],
+            outdir=outdir,
+            threads=threads,
+            log_fd=log_fd,
+            dry_run=dry_run,
+        )
+    except Exception as e:
+        error = str(e)
+
+    for name, fq1, fq2, zips, key, _ in pending:
+        if dry_run:
+            results.append(StepResult(name, step, "OK", ""))
+        elif all(file_ok(z) for z in zips):
+            store_cache(outdir, fq1.name, key)
+            results.append(StepResult(name, step, "OK", ""))
+        else:
+            results.append(StepResult(name, step, "FAIL", error or "FastQC output missing"))
+    return results
+
+
+async def trim_sample(
+    s: Sample,
+    fastp_cmd: str,
+    d_trim: Path,
+    d_decompress: Path,
+    threads: int,
+    fastp_extra: str,
+    rapidgzip_cmd: Optional[str],
+    rapidgzip_min_bytes: int,
+    log_fd: int,
+    dry_run: bool,
+) -> StepResult:
+    """
+    fastp for one sample; samples are trimmed concurrently.
+    """
+    print(f"--- Sample: {s.name} ---")
+    try:
+        ran = await step_fastp(
+            fastp_cmd=fastp_cmd,
+            sample=s.name,
+            fq1=s.fq1,
+            fq2=s.fq2,
+            outdir=d_trim,
+            threads=threads,
+            extra_args=fastp_extra,
+            log_fd=log_fd,
+            dry_run=dry_run,
+            rapidgzip_cmd=rapidgzip_cmd,
+            rapidgzip_min_bytes=rapidgzip_min_bytes,
+            decompress_dir=d_decompress / s.name,
+        )
+        if not ran:
+            return StepResult(s.name, "trim_fastp", "SKIP", "outputs up to date")
+        return StepResult(s.name, "trim_fastp", "OK", "")
+    except Exception as e:
+        return StepResult(s.name, "trim_fastp", "FAIL", str(e))
+
+
+async def run_pipeline(
+    samples: List[Sample],
+    fastqc_cmd: str,
+    fastp_cmd: str,
+    multiqc_cmd: str,
+    steps: Dict,
+    outdir: Path,
+    threads: int,
+    parallel_samples: int,
+    fastp_extra: str,
+    rapidgzip_cmd: Optional[str],
+    rapidgzip_min_bytes: int,
+    multiqc_modules: List[str],
+    multiqc_ignore: List[str],
+    pipeline_log_fd: int,
+    dry_run: bool,
+) -> List[StepResult]:
+    """
+    Raw FastQC (one batch) -> fastp (up to parallel_samples at once)
+    -> trimmed FastQC (one batch) -> MultiQC.
+    A sample that fails a step is dropped from the later steps.
+    fastp logs per sample to logs/{sample}.log so concurrent runs don't interleave.
+    """
+    # Step output roots
+    d_fastqc_raw = outdir / "01_fastqc_raw"
+    d_trim = outdir / "02_trim_fastp"
+    d_fastqc_trim = outdir / "03_fastqc_trimmed"
+    d_multiqc = outdir / "04_multiqc"
+    d_decompress = outdir / "00_decompressed"
+
+    # one FastQC JVM gets the CPU budget the per-sample phase would use
+    fastqc_threads = threads * parallel_samples
+
+    # Ctrl-C / SIGTERM: cancel the run; each running step stops its tool and cleans up
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+
+    results: List[StepResult] = []
+    active = list(samples)
+
+    def keep_passed(step_results: List[StepResult]) -> None:
+        nonlocal active
+        results.extend(step_results)
+        failed = {r.sample for r in step_results if r.status == "FAIL"}
+        active = [s for s in active if s.name not in failed]
+
+    # FastQC raw
+    if steps.get("fastqc_raw", True) and active:
+        keep_passed(await fastqc_phase(
+            step="fastqc_raw",
+            fastqc_cmd=fastqc_cmd,
+            pairs=[(s.name, s.fq1, s.fq2) for s in active],
+            outdir=d_fastqc_raw,
+            threads=fastqc_threads,
+            log_fd=pipeline_log_fd,
+            dry_run=dry_run,
+        ))
+
+    # fastp trim
+    trimmed = False
+    if steps.get("trim_fastp", True):
+        trimmed = True
+        sem = asyncio.Semaphore(parallel_samples)
+
+        async def sem_wrapped(s: Sample) -> StepResult:
+            async with sem:
+                # one fd per sample, shared by all of its tools
+                with open_log_fd(outdir / "logs" / f"{s.name}.log") as log_fd:
+                    return await trim_sample(
+                        s,
+                        fastp_cmd=fastp_cmd,
+                        d_trim=d_trim,
+                        d_decompress=d_decompress,
+                        threads=threads,
+                        fastp_extra=fastp_extra,
+                        rapidgzip_cmd=rapidgzip_cmd,
+                        rapidgzip_min_bytes=rapidgzip_min_bytes,
+                        log_fd=log_fd,
+                        dry_run=dry_run,
+                    )
+
+        # return_exceptions: on ^C, wait until every sample has stopped its tool and removed
+        # its partial outputs (a plain gather returns as soon as the first one is cancelled)
+        trim_results = await asyncio.gather(*(sem_wrapped(s) for s in active), return_exceptions=True)
+        for r in trim_results:
+            if isinstance(r, BaseException):
+                raise r
+        keep_passed(trim_results)
+
+    # FastQC trimmed
+    if steps.get("fastqc_trimmed", True):
+        if not trimmed:
+            # if trimming disabled, you can choose to fastqc raw only; we won't guess.
+            results.extend(StepResult(s.name, "fastqc_trimmed", "SKIP", "no trimmed reads") for s in active)
+        elif active:
+            pairs = []
+            for s in active:
+                trim1, trim2, _, _ = fastp_outputs(d_trim, s.name)
+                pairs.append((s.name, trim1, trim2))
+            keep_passed(await fastqc_phase(
+                step="fastqc_trimmed",
+                fastqc_cmd=fastqc_cmd,
+                pairs=pairs,
+                outdir=d_fastqc_trim,
+                threads=fastqc_threads,
+                log_fd=pipeline_log_fd,
+                dry_run=dry_run,
+            ))
+
+    # MultiQC (once)
+    if steps.get("multiqc", True):
+        try:
+            report = d_multiqc / "multiqc_report.html"
+            # keyed on the reports it aggregates, so any rerun sample refreshes it
+            mqc_inputs = (
+                sorted(d_fastqc_raw.glob("*_fastqc.zip"))
+                + sorted(d_trim.glob("*/*.fastp.json"))
+                + sorted(d_fastqc_trim.glob("*_fastqc.zip"))
+            )
+            key = cache_key(mqc_inputs, " ".join(multiqc_modules + ["-x"] + multiqc_ignore))
+            if outputs_current([report], d_multiqc, "multiqc", key):
+                results.append(StepResult("ALL", "multiqc", "SKIP", "outputs up to date"))
+            else:
+                if not dry_run:
+                    store_cache(d_multiqc, "multiqc", None)
+                await step_multiqc(
+                    multiqc_cmd=multiqc_cmd,
+                    scan_dir=outdir,
+                    outdir=d_multiqc,
+                    modules=multiqc_modules,
+                    ignore=multiqc_ignore,
+                    log_fd=pipeline_log_fd,
+                    dry_run=dry_run,
+                )
+                if not dry_run:
+                    store_cache(d_multiqc, "multiqc", key)
+                results.append(StepResult("ALL", "multiqc", "OK", ""))
+        except Exception as e:
+            results.append(StepResult("ALL", "multiqc", "FAIL", str(e)))
+
+    return results
+
+
 def write_report(
     outdir: Path,
     cfg: Dict,
@@ -296,43 +788,45 @@ def write_report(
     ok = [r for r in results if r.status == "OK"]
     skipped = [r for r in results if r.status == "SKIP"]
 
-    lines: List[str] = []
-    lines.append("# RNA-seq QC Report\n")
-    lines.append(f"- Generated: {now_iso()}\n")
-    lines.append(f"- Samples: {total}\n")
-    lines.append(f"- Outdir: `{outdir}`\n")
-
-    lines.append("\n## Tool Versions\n")
-    for k, v in tool_versions.items():
-        lines.append(f"- **{k}**: {v}\n")
-
-    lines.append("\n## Steps Enabled\n")
     steps = cfg.get("steps", {})
-    for k in ["fastqc_raw", "trim_fastp", "fastqc_trimmed", "multiqc"]:
-        lines.append(f"- {k}: {bool(steps.get(k, False))}\n")
-
-    lines.append("\n## Key Outputs\n")
-    lines.append(f"- Raw FastQC: `{outdir / '01_fastqc_raw'}`\n")
-    lines.append(f"- fastp trimmed reads: `{outdir / '02_trim_fastp'}`\n")
-    lines.append(f"- Trimmed FastQC: `{outdir / '03_fastqc_trimmed'}`\n")
-    lines.append(f"- MultiQC: `{outdir / '04_multiqc' / 'multiqc_report.html'}`\n")
-
-    lines.append("\n## Run Summary\n")
-    lines.append(f"- OK: {len(ok)}\n")
-    lines.append(f"- Skipped: {len(skipped)}\n")
-    lines.append(f"- Failed: {len(failed)}\n")
-
+    versions_md = "".join(f"- **{k}**: {v}\n" for k, v in tool_versions.items())
+    steps_md = "".join(
+        f"- {k}: {bool(steps.get(k, False))}\n"
+        for k in ["fastqc_raw", "trim_fastp", "fastqc_trimmed", "multiqc"]
+    )
+    failures_md = ""
     if failed:
-        lines.append("\n## Failures (must fix)\n")
-        for r in failed:
-            lines.append(f"- **{r.sample}** / {r.step}: {r.detail}\n")
-
-    lines.append("\n## Interpretation Notes\n")
-    lines.append("- Open `04_multiqc/multiqc_report.html` and scan for outliers.\n")
-    lines.append("- If trimming removes a large fraction of reads, investigate adapter/quality issues.\n")
-    lines.append("- If one sample is a severe outlier across metrics, confirm sample identity / contamination.\n")
+        failures_md = "\n## Failures (must fix)\n" + "".join(
+            f"- **{r.sample}** / {r.step}: {r.detail}\n" for r in failed
+        )
 
-    report_path.write_text("".join(lines), encoding="utf-8")
+    report = f"""\
+# RNA-seq QC Report
+- Generated: {now_iso()}
+- Samples: {total}
+- Outdir: `{outdir}`
+
+## Tool Versions
+{versions_md}
+## Steps Enabled
+{steps_md}
+## Key Outputs
+- Raw FastQC: `{outdir / '01_fastqc_raw'}`
+- fastp trimmed reads: `{outdir / '02_trim_fastp'}` (gzip level {fastp_extra_args(cfg)[1]})
+- Trimmed FastQC: `{outdir / '03_fastqc_trimmed'}`
+- MultiQC: `{outdir / '04_multiqc' / 'multiqc_report.html'}`
+
+## Run Summary
+- OK: {len(ok)}
+- Skipped: {len(skipped)}
+- Failed: {len(failed)}
+{failures_md}
+## Interpretation Notes
+- Open `04_multiqc/multiqc_report.html` and scan for outliers.
+- If trimming removes a large fraction of reads, investigate adapter/quality issues.
+- If one sample is a severe outlier across metrics, confirm sample identity / contamination.
+"""
+    report_path.write_text(report, encoding="utf-8")
     return report_path
 
 
@@ -371,138 +865,75 @@ def main() -> None:
 
     # Resolve tools early (fail fast)
     fastqc_cmd = which_or_die("fastqc", str(tools.get("fastqc", "fastqc")))
-    fastp_cmd = which_or_die("fastp", str(tools.get("fastp", "fastp")))
+    # a fastp linked against ISA-L compresses its gzip output several times faster
+    fastp_isal = (cfg.get("fastp", {}) or {}).get("binary_isal")
+    fastp_cmd = which_or_die("fastp", str(fastp_isal or tools.get("fastp", "fastp")))
     multiqc_cmd = which_or_die("multiqc", str(tools.get("multiqc", "multiqc")))
 
-    # Capture versions (best-effort)
-    tool_versions = {
-        "fastqc": get_tool_version(fastqc_cmd, pipeline_log),
-        "fastp": get_tool_version(fastp_cmd, pipeline_log),
-        "multiqc": get_tool_version(multiqc_cmd, pipeline_log),
-        "python": sys.version.split()[0],
-    }
-
-    print("\n=== RUNNING QC PIPELINE ===")
-    print(f"Config: {cfg_path}")
-    print(f"Samples: {samples_tsv}")
-    print(f"Outdir: {outdir}")
-    print(f"Threads: {threads}")
-    if args.dry_run:
-        print("Mode: DRY-RUN (no commands executed)")
-
-    samples = load_samples_tsv(samples_tsv)
-    if args.limit and args.limit > 0:
-        samples = samples[: args.limit]
-
-    validate_inputs(samples)
-
-    results: List[StepResult] = []
-
-    # Step output roots
-    d_fastqc_raw = outdir / "01_fastqc_raw"
-    d_trim = outdir / "02_trim_fastp"
-    d_fastqc_trim = outdir / "03_fastqc_trimmed"
-    d_multiqc = outdir / "04_multiqc"
+    with open_log_fd(pipeline_log) as log_fd:
+        # Capture versions (best-effort)
+        tool_versions = {
+            "fastqc": get_tool_version(fastqc_cmd, log_fd),
+            "fastp": get_tool_version(fastp_cmd, log_fd),
+            "multiqc": get_tool_version(multiqc_cmd, log_fd),
+            "python": sys.version.split()[0],
+        }
+
+        print("\n=== RUNNING QC PIPELINE ===")
+        print(f"Config: {cfg_path}")
+        print(f"Samples: {samples_tsv}")
+        print(f"Outdir: {outdir}")
+        print(f"Threads: {threads}")
+        if args.dry_run:
+            print("Mode: DRY-RUN (no commands executed)")
+
+        samples = load_samples_tsv(samples_tsv)
+        if args.limit and args.limit > 0:
+            samples = samples[: args.limit]
+
+        validate_inputs(samples)
+
+        parallel_samples = int(cfg.get("parallel_samples", max(1, (os.cpu_count() or 1) // threads)))
+        print(f"Parallel samples: {parallel_samples}")
+
+        fastp_extra, _ = fastp_extra_args(cfg)
+
+        # Optional: parallel gzip decompression ahead of fastp (needs many cores to pay off)
+        preprocess = cfg.get("preprocess", {}) or {}
+        rapidgzip_cmd: Optional[str] = None
+        if preprocess.get("rapidgzip", False) and (os.cpu_count() or 1) >= int(preprocess.get("min_cpus", 16)):
+            rapidgzip_cmd = shutil.which(str(tools.get("rapidgzip", "rapidgzip")))
+            if not rapidgzip_cmd:
+                print("WARNING: preprocess.rapidgzip enabled but rapidgzip not found; fastp reads .gz directly")
+        rapidgzip_min_bytes = int(float(preprocess.get("min_gz_mb", 1024)) * 1024 * 1024)
+
+        # MultiQC: only look for the tools this pipeline runs, skip unrelated subtrees
+        multiqc_cfg = cfg.get("multiqc", {}) or {}
+        multiqc_modules = [str(m) for m in multiqc_cfg.get("modules", ["fastqc", "fastp"])]
+        multiqc_ignore = [str(x) for x in multiqc_cfg.get("ignore", [".snakemake/*", "work/*", "*.bam"])]
 
-    fastp_extra = (cfg.get("fastp", {}) or {}).get("extra_args", "")
-
-    for s in samples:
-        print(f"\n--- Sample: {s.name} ---")
-
-        # FastQC raw
-        if steps.get("fastqc_raw", True):
-            try:
-                zip1 = d_fastqc_raw / f"{s.fq1.name}_fastqc.zip"
-                zip2 = d_fastqc_raw / f"{s.fq2.name}_fastqc.zip"
-                if file_ok(zip1) and file_ok(zip2):
-                    results.append(StepResult(s.name, "fastqc_raw", "SKIP", "outputs exist"))
-                else:
-                    step_fastqc(
-                        fastqc_cmd=fastqc_cmd,
-                        fq1=s.fq1,
-                        fq2=s.fq2,
-                        outdir=d_fastqc_raw,
-                        threads=threads,
-                        log_path=pipeline_log,
-                        dry_run=args.dry_run,
-                    )
-                    results.append(StepResult(s.name, "fastqc_raw", "OK", ""))
-            except Exception as e:
-                results.append(StepResult(s.name, "fastqc_raw", "FAIL", str(e)))
-                continue  # don't proceed for this sample
-
-        # fastp trim
-        trim1 = trim2 = None
-        if steps.get("trim_fastp", True):
-            try:
-                sdir = d_trim / s.name
-                trim1p = sdir / f"{s.name}_R1.trim.fq.gz"
-                trim2p = sdir / f"{s.name}_R2.trim.fq.gz"
-                jsonp = sdir / f"{s.name}.fastp.json"
-                htmlp = sdir / f"{s.name}.fastp.html"
-                if file_ok(trim1p) and file_ok(trim2p) and file_ok(jsonp) and file_ok(htmlp):
-                    results.append(StepResult(s.name, "trim_fastp", "SKIP", "outputs exist"))
-                    trim1, trim2 = trim1p, trim2p
-                else:
-                    trim1, trim2, _, _ = step_fastp(
-                        fastp_cmd=fastp_cmd,
-                        sample=s.name,
-                        fq1=s.fq1,
-                        fq2=s.fq2,
-                        outdir=d_trim,
-                        threads=threads,
-                        extra_args=str(fastp_extra),
-                        log_path=pipeline_log,
-                        dry_run=args.dry_run,
-                    )
-                    results.append(StepResult(s.name, "trim_fastp", "OK", ""))
-            except Exception as e:
-                results.append(StepResult(s.name, "trim_fastp", "FAIL", str(e)))
-                continue
-
-        # FastQC trimmed
-        if steps.get("fastqc_trimmed", True):
-            if trim1 is None or trim2 is None:
-                # if trimming disabled, you can choose to fastqc raw only; we won't guess.
-                results.append(StepResult(s.name, "fastqc_trimmed", "SKIP", "no trimmed reads"))
-            else:
-                try:
-                    zip1 = d_fastqc_trim / f"{Path(trim1).name}_fastqc.zip"
-                    zip2 = d_fastqc_trim / f"{Path(trim2).name}_fastqc.zip"
-                    if file_ok(zip1) and file_ok(zip2):
-                        results.append(StepResult(s.name, "fastqc_trimmed", "SKIP", "outputs exist"))
-                    else:
-                        step_fastqc(
-                            fastqc_cmd=fastqc_cmd,
-                            fq1=Path(trim1),
-                            fq2=Path(trim2),
-                            outdir=d_fastqc_trim,
-                            threads=threads,
-                            log_path=pipeline_log,
-                            dry_run=args.dry_run,
-                        )
-                        results.append(StepResult(s.name, "fastqc_trimmed", "OK", ""))
-                except Exception as e:
-                    results.append(StepResult(s.name, "fastqc_trimmed", "FAIL", str(e)))
-                    continue
-
-    # MultiQC (once)
-    if steps.get("multiqc", True):
         try:
-            report = d_multiqc / "multiqc_report.html"
-            if file_ok(report):
-                results.append(StepResult("ALL", "multiqc", "SKIP", "report exists"))
-            else:
-                step_multiqc(
-                    multiqc_cmd=multiqc_cmd,
-                    scan_dir=outdir,
-                    outdir=d_multiqc,
-                    log_path=pipeline_log,
-                    dry_run=args.dry_run,
-                )
-                results.append(StepResult("ALL", "multiqc", "OK", ""))
-        except Exception as e:
-            results.append(StepResult("ALL", "multiqc", "FAIL", str(e)))
+            results = asyncio.run(run_pipeline(
+                samples,
+                fastqc_cmd=fastqc_cmd,
+                fastp_cmd=fastp_cmd,
+                multiqc_cmd=multiqc_cmd,
+                steps=steps,
+                outdir=outdir,
+                threads=threads,
+                parallel_samples=parallel_samples,
+                fastp_extra=str(fastp_extra),
+                rapidgzip_cmd=rapidgzip_cmd,
+                rapidgzip_min_bytes=rapidgzip_min_bytes,
+                multiqc_modules=multiqc_modules,
+                multiqc_ignore=multiqc_ignore,
+                pipeline_log_fd=log_fd,
+                dry_run=args.dry_run,
+            ))
+        except (asyncio.CancelledError, KeyboardInterrupt):
+            kill_active_children()  # anything that escaped step cleanup
+            log_write(log_fd, "[pipeline] INTERRUPTED\n")
+            die("Interrupted: running tools were stopped and partial outputs removed. Rerun to resume.", code=130)
 
     report_path = write_report(outdir=outdir, cfg=cfg, samples=samples, results=results, tool_versions=tool_versions)
 
@@ -511,6 +942,7 @@ def main() -> None:
     print("\n=== DONE ===")
     print(f"Report: {report_path}")
     print(f"Log: {pipeline_log}")
+    print(f"Per-sample logs: {outdir / 'logs'}")
     if failed:
         print("\nFailures:")
         for r in failed:
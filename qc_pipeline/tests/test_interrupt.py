@@ -0,0 +1,116 @@
+"""
+Ctrl-C while fastp runs: tools are stopped and their partial outputs removed.
+Runs run_qc_pipeline.py end to end against stub fastqc/fastp/multiqc scripts.
+"""
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("yaml")
+
+SCRIPT = Path(__file__).resolve().parents[1] / "run_qc_pipeline.py"
+
+STUB_FASTQC = """\
+import pathlib, sys
+args = sys.argv[1:]
+if args[0] in ("--version", "-v"):
+    print("FastQC v0.12.1")
+    sys.exit()
+out = pathlib.Path(args[args.index("--outdir") + 1])
+for fq in args[args.index("--outdir") + 2:]:
+    name = pathlib.Path(fq).name
+    for suffix in (".gz", ".fq"):
+        name = name.removesuffix(suffix)
+    (out / f"{name}_fastqc.zip").write_text("z")
+    (out / f"{name}_fastqc.html").write_text("h")
+"""
+
+# writes every output first, then runs until stopped; exits slowly on SIGTERM like a real tool
+STUB_FASTP = """\
+import pathlib, signal, sys, time
+args = sys.argv[1:]
+if args[0] in ("--version", "-v"):
+    print("fastp 0.23.4", file=sys.stderr)
+    sys.exit()
+
+def slow_exit(*_):
+    time.sleep(0.5)
+    sys.exit(143)
+
+signal.signal(signal.SIGTERM, slow_exit)
+for flag in ("--out1", "--out2", "--json", "--html"):
+    pathlib.Path(args[args.index(flag) + 1]).write_text("partial")
+time.sleep(60)
+"""
+
+STUB_MULTIQC = """\
+import sys
+if sys.argv[1:2] == ["--version"]:
+    print("multiqc, version 1.21")
+"""
+
+
+def write_stub(path: Path, body: str) -> Path:
+    path.write_text(f"#!{sys.executable}\n{body}")
+    path.chmod(0o755)
+    return path
+
+
+def test_sigint_during_fastp_removes_partial_outputs(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    fastqc = write_stub(bin_dir / "fastqc", STUB_FASTQC)
+    fastp = write_stub(bin_dir / "fastp", STUB_FASTP)
+    multiqc = write_stub(bin_dir / "multiqc", STUB_MULTIQC)
+
+    samples = ["A", "B", "C"]
+    rows = ["sample\tfq1\tfq2"]
+    for s in samples:
+        for r in (1, 2):
+            (tmp_path / f"{s}_{r}.fq.gz").write_bytes(b"reads")
+        rows.append(f"{s}\t{s}_1.fq.gz\t{s}_2.fq.gz")
+    (tmp_path / "samples.tsv").write_text("\n".join(rows) + "\n")
+
+    # two samples run, the third waits on the semaphore when ^C arrives
+    (tmp_path / "config.yaml").write_text(textwrap.dedent(f"""\
+        samples_tsv: samples.tsv
+        outdir: results
+        threads: 1
+        parallel_samples: 2
+        tools:
+          fastqc: {fastqc}
+          fastp: {fastp}
+          multiqc: {multiqc}
+        """))
+
+    proc = subprocess.Popen(
+        [sys.executable, str(SCRIPT)],
+        cwd=tmp_path,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    try:
+        html = tmp_path / "results" / "02_trim_fastp" / "A" / "A.fastp.html"
+        deadline = time.monotonic() + 30
+        while not html.exists():
+            assert proc.poll() is None, proc.stdout.read().decode()
+            assert time.monotonic() < deadline, "fastp never started"
+            time.sleep(0.05)
+        time.sleep(0.2)
+
+        proc.send_signal(signal.SIGINT)
+        out, _ = proc.communicate(timeout=30)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+
+    assert proc.returncode == 130, out.decode()
+    leftovers = sorted(p.name for p in (tmp_path / "results" / "02_trim_fastp").rglob("*") if p.is_file())
+    assert leftovers == []
+    for s in ("A", "B"):
+        assert "INTERRUPTED" in (tmp_path / "results" / "logs" / f"{s}.log").read_text()
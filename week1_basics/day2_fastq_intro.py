@@ -12,19 +12,32 @@ def open_text(path: Path):
     return open(path_str, "r", encoding="utf-8", errors="replace")
 
 
-def fastq_iter(path: Path):
-    """Yield FASTQ records: (header, seq, plus, qual)."""
+def fastq_iter(path: Path, chunk_chars: int = 4 << 20):
+    """
+    Yield FASTQ records: (header, seq, plus, qual).
+    Reads big chunks and splits them with one str.split per chunk,
+    instead of building and trimming four line strings per record.
+    """
+    pending: list[str] = []  # lines of a record cut off by the chunk boundary
+    partial = ""  # last line of the chunk, no newline yet
     with open_text(path) as f:
-        while True:
-            h = f.readline()
-            if not h:
-                break
-            s = f.readline()
-            p = f.readline()
-            q = f.readline()
-            if not (s and p and q):
-                raise ValueError("FASTQ ended unexpectedly (incomplete record).")
-            yield h.strip(), s.strip(), p.strip(), q.strip()
+        # text mode turns CRLF into "\n", so splitting on "\n" strips line ends
+        while chunk := f.read(chunk_chars):
+            lines = (partial + chunk).split("\n")
+            partial = lines.pop()
+            if pending:
+                lines[:0] = pending
+            n = len(lines) & ~3
+            pending = lines[n:]
+            del lines[n:]
+            it = iter(lines)
+            yield from zip(it, it, it, it)
+    if partial:
+        pending.append(partial)  # last line without trailing newline
+    if len(pending) == 4:
+        yield tuple(pending)
+    elif pending:
+        raise ValueError("FASTQ ended unexpectedly (incomplete record).")
 
 
 def basic_stats(path: Path, preview_reads: int = 3, max_reads: int | None = None):
@@ -1,56 +1,217 @@
 # Day 2: FASTQ basic stats (supports .fastq and .fastq.gz)
 
+from itertools import islice
 from pathlib import Path
 import gzip
+import io
+import os
+import shutil
+import signal
+import subprocess
+
+try:
+    # ISA-L inflate (pip install isal) is ~3x faster than zlib; same API as gzip
+    from isal import igzip as _gz
+except ImportError:
+    _gz = gzip
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+# above this size, decompress with rapidgzip (parallel inflate) if it's installed
+RAPIDGZIP_MIN_BYTES = 100 * 1024 * 1024
+
+# bytes (or characters) read per chunk by the FASTQ readers
+CHUNK_BYTES = 4 << 20
+
+
+class PipeReader(io.BufferedReader):
+    """Binary stream over a child process's stdout; reaps the child on close and checks its exit status."""
+
+    def __init__(self, proc: subprocess.Popen):
+        super().__init__(proc.stdout.detach())
+        self.proc = proc
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        rc = self.proc.wait()
+        # -SIGPIPE only means we stopped reading early; anything else is a corrupt or
+        # truncated file, which gzip.open would have raised on too
+        if rc and rc != -signal.SIGPIPE:
+            raise gzip.BadGzipFile(f"{' '.join(map(str, self.proc.args))} exited with status {rc}")
+
+
+def open_bytes(path: Path):
+    """Open plain or .gz file as a binary stream (decompressed)."""
+    path_str = str(path)
+    if path_str.endswith(".gz"):
+        rapidgzip = shutil.which("rapidgzip")
+        if rapidgzip and os.path.getsize(path_str) > RAPIDGZIP_MIN_BYTES:
+            threads = os.cpu_count() or 1
+            proc = subprocess.Popen(
+                [rapidgzip, "-d", "-c", "-P", str(threads), path_str], stdout=subprocess.PIPE
+            )
+            return PipeReader(proc)
+        return _gz.open(path_str, "rb")
+    return open(path_str, "rb")
 
 
 def open_text(path: Path):
     """Open plain text or .gz text file transparently."""
-    path_str = str(path)
-    if path_str.endswith(".gz"):
-        return gzip.open(path_str, "rt", encoding="utf-8", errors="replace")
-    return open(path_str, "r", encoding="utf-8", errors="replace")
+    return io.TextIOWrapper(open_bytes(path), encoding="utf-8", errors="replace")
 
 
-def fastq_iter(path: Path):
-    """Yield FASTQ records: (header, seq, plus, qual)."""
+def fastq_iter(path: Path, chunk_chars: int = CHUNK_BYTES):
+    """
+    Yield FASTQ records: (header, seq, plus, qual).
+    Reads big chunks and splits them with one str.split per chunk,
+    instead of building and trimming four line strings per record.
+    """
+    pending: list[str] = []  # lines of a record cut off by the chunk boundary
+    partial = ""  # last line of the chunk, no newline yet
     with open_text(path) as f:
-        while True:
-            h = f.readline()
-            if not h:
-                break
-            s = f.readline()
-            p = f.readline()
-            q = f.readline()
-            if not (s and p and q):
-                raise ValueError("FASTQ ended unexpectedly (incomplete record).")
-            yield h.strip(), s.strip(), p.strip(), q.strip()
+        # text mode turns CRLF into "\n", so splitting on "\n" strips line ends
+        while chunk := f.read(chunk_chars):
+            lines = (partial + chunk).split("\n")
+            partial = lines.pop()
+            if pending:
+                lines[:0] = pending
+            n = len(lines) & ~3
+            pending = lines[n:]
+            del lines[n:]
+            it = iter(lines)
+            yield from zip(it, it, it, it)
+    if partial:
+        pending.append(partial)  # last line without trailing newline
+    if len(pending) == 4:
+        yield tuple(pending)
+    elif pending:
+        raise ValueError("FASTQ ended unexpectedly (incomplete record).")
+
+
+def length_stats_np(path: Path, max_reads: int | None = None):
+    """
+    Read length stats without a Python loop per read.
+    Reads raw bytes in big chunks and finds newlines with NumPy:
+    the sequence of record k sits between newline 4k and newline 4k+1.
+    Returns (n, min_len, max_len, total_len).
+    """
+    n = total = mx = 0
+    mn = None
+    tail = b""
+    eof = False
+
+    with open_bytes(path) as f:
+        while not eof and (max_reads is None or n < max_reads):
+            chunk = f.read(CHUNK_BYTES)
+            eof = not chunk
+            buf = tail + chunk
+            if eof and buf and not buf.endswith(b"\n"):
+                buf += b"\n"  # last line without trailing newline
+
+            arr = np.frombuffer(buf, dtype=np.uint8)
+            nl = np.flatnonzero(arr == 10)
+            k = len(nl) // 4
+            if max_reads is not None:
+                k = min(k, max_reads - n)
+            if k == 0:
+                tail = buf
+                continue
+
+            seq_end = nl[1:4 * k:4]
+            lens = seq_end - nl[0:4 * k:4] - 1
+            lens -= arr[seq_end - 1] == 13  # CRLF line endings
+
+            n += k
+            total += int(lens.sum())
+            mx = max(mx, int(lens.max()))
+            mn = int(lens.min()) if mn is None else min(mn, int(lens.min()))
+            tail = buf[nl[4 * k - 1] + 1:]
+
+    if eof and tail.strip():
+        raise ValueError("FASTQ ended unexpectedly (incomplete record).")
+    return n, mn, mx, total
+
+
+if HAVE_NUMPY:
+    # 2-bit codes: A=0 C=1 G=2 T=3 (lowercase too); anything else, e.g. N, packs as A
+    BASE_CODE = np.zeros(256, dtype=np.uint8)
+    for code, base in enumerate(b"ACGT"):
+        BASE_CODE[base] = BASE_CODE[base + 32] = code
+    CODE_BASE = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+
+# 2-bit packing: library helpers for later per-base work (k-mers, base composition);
+# basic_stats doesn't call them. They need NumPy, unlike the rest of this script.
+def _require_numpy(name: str) -> None:
+    if not HAVE_NUMPY:
+        raise ImportError(f"{name} needs NumPy (pip install numpy)")
+
+
+def pack_seq(seq: bytes):
+    """Pack a sequence to 2 bits/base, four bases per uint8 (last byte zero-padded)."""
+    _require_numpy("pack_seq")
+    codes = BASE_CODE[np.frombuffer(seq, dtype=np.uint8)]
+    codes = np.pad(codes, (0, -len(codes) % 4))
+    return codes.reshape(-1, 4).dot(np.array([64, 16, 4, 1], dtype=np.uint8)).astype(np.uint8)
+
+
+def unpack_seq(packed, length: int) -> bytes:
+    """Inverse of pack_seq (non-ACGT bases come back as A)."""
+    _require_numpy("unpack_seq")
+    bits = np.unpackbits(packed).reshape(-1, 2)
+    codes = bits[:, 0] * 2 + bits[:, 1]
+    return CODE_BASE[codes[:length]].tobytes()
+
+
+def pack_fastq(path: Path, max_reads: int | None = None):
+    """Read FASTQ once into [(packed_seq, length), ...] for later per-base work (e.g. k-mers)."""
+    _require_numpy("pack_fastq")
+    return [
+        (pack_seq(s.encode("ascii")), len(s))
+        for h, s, p, q in islice(fastq_iter(path), max_reads)
+    ]
 
 
 def basic_stats(path: Path, preview_reads: int = 3, max_reads: int | None = None):
-    n = 0
-    lengths: list[int] = []
     preview: list[tuple[str, str, int]] = []
 
-    for h, s, p, q in fastq_iter(path):
-        n += 1
-        lengths.append(len(s))
-
-        if n <= preview_reads:
+    if HAVE_NUMPY:
+        n, mn, mx, total = length_stats_np(path, max_reads=max_reads)
+        for h, s, p, q in islice(fastq_iter(path), min(preview_reads, n)):
             s50 = s[:50] + ("..." if len(s) > 50 else "")
             preview.append((h, s50, len(s)))
+    else:
+        n = 0
+        lengths: list[int] = []
+
+        for h, s, p, q in fastq_iter(path):
+            n += 1
+            lengths.append(len(s))
+
+            if n <= preview_reads:
+                s50 = s[:50] + ("..." if len(s) > 50 else "")
+                preview.append((h, s50, len(s)))
+
+            if max_reads is not None and n >= max_reads:
+                break
 
-        if max_reads is not None and n >= max_reads:
-            break
+        if lengths:
+            mn, mx, total = min(lengths), max(lengths), sum(lengths)
 
     if n == 0:
         raise ValueError("No reads found. FASTQ empty?")
 
-    avg_len = sum(lengths) / n
+    avg_len = total / n
 
     print(f"File: {path}")
     print(f"Reads processed: {n}")
-    print(f"Read length min/avg/max: {min(lengths)} / {avg_len:.1f} / {max(lengths)}")
+    print(f"Read length min/avg/max: {mn} / {avg_len:.1f} / {mx}")
     print("\nPreview (first reads):")
     for h, s50, L in preview:
         print(h)
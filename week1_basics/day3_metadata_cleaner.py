@@ -1,18 +1,18 @@
 import csv
+import re
 from pathlib import Path
 
 REQUIRED_COLS = ["sample_id", "condition"]
 
+# \W = anything that isn't a letter, digit or underscore (same rule as isalnum() or "_")
+_NON_ID_CHARS = re.compile(r"\W")
+
 def clean_sample_id(s: str) -> str:
     s = s.strip()
     s = s.replace(" ", "_")
     s = s.replace("-", "_")
     # keep it simple: letters, digits, underscore only
-    out = []
-    for ch in s:
-        if ch.isalnum() or ch == "_":
-            out.append(ch)
-    return "".join(out)
+    return _NON_ID_CHARS.sub("", s)
 
 def validate_columns(header):
     missing = [c for c in REQUIRED_COLS if c not in header]
@@ -21,15 +21,23 @@ def validate_columns(header):
 
 def clean_metadata(in_csv: Path, out_csv: Path):
     with open(in_csv, "r", newline="", encoding="utf-8", errors="replace") as f:
-        reader = csv.DictReader(f)
-        header = reader.fieldnames or []
+        # plain lists in header order: no per-row dict building or re-projection
+        reader = csv.reader(f)
+        header = next(reader, [])
         validate_columns(header)
+        sid_col = header.index("sample_id")
 
         rows = []
         seen = set()
 
         for row in reader:
-            sid_raw = row["sample_id"]
+            if not row:
+                continue  # blank line
+            if len(row) > len(header):
+                raise ValueError(f"Row has more fields than header: {row}")
+            row += [""] * (len(header) - len(row))
+
+            sid_raw = row[sid_col]
             sid = clean_sample_id(sid_raw)
 
             if not sid:
@@ -39,12 +47,12 @@ def clean_metadata(in_csv: Path, out_csv: Path):
                 raise ValueError(f"Duplicate sample_id after cleaning: {sid}")
             seen.add(sid)
 
-            row["sample_id"] = sid
+            row[sid_col] = sid
             rows.append(row)
 
     with open(out_csv, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=header)
-        writer.writeheader()
+        writer = csv.writer(f)
+        writer.writerow(header)
         writer.writerows(rows)
 
     print(f"Cleaned rows: {len(rows)}")
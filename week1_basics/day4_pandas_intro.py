@@ -1,7 +1,26 @@
+from functools import reduce
+
+import numpy as np
 import pandas as pd
 
-# Load table
-df = pd.read_csv("counts.csv")
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pcsv
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+# Load table (pyarrow parses CSV multi-threaded, if installed)
+if HAVE_ARROW:
+    table = pcsv.read_csv("counts.csv", read_options=pcsv.ReadOptions(use_threads=True))
+    # pandas reads any column with empty cells as float NaN (an all-empty one Arrow types as null)
+    for i, col in enumerate(table.columns):
+        if col.null_count and (pa.types.is_null(col.type) or pa.types.is_integer(col.type)):
+            table = table.set_column(i, table.field(i).name, col.cast(pa.float64()))
+    df = table.to_pandas()
+else:
+    df = pd.read_csv("counts.csv")
 
 print("\n--- HEAD ---")
 print(df.head())
@@ -14,12 +33,40 @@ print("\n--- DESCRIBE ---")
 print(df.describe())
 
 # Filter: keep genes with total counts > 50
-df["sum_counts"] = df.iloc[:, 1:].sum(axis=1)
-filtered = df[df["sum_counts"] > 50]
+if HAVE_ARROW:
+    # stay in Arrow columns end to end: sum -> mask -> filter -> write
+    # empty cells count as 0 (pandas' skipna sum); fill_null needs a numeric type, and a
+    # column can still be null-typed here if the table has no rows
+    sample_cols = [col.cast(pa.float64()) if pa.types.is_null(col.type) else col for col in table.columns[1:]]
+    sum_counts = reduce(pc.add_checked, (pc.fill_null(col, 0) for col in sample_cols))
+    table = table.append_column("sum_counts", sum_counts)
+    filtered = table.filter(pc.greater(sum_counts, 50))
+    n_filtered = filtered.num_rows
+else:
+    # one reduction over the raw 2-D array instead of column-by-column Series ops
+    # (nansum: empty cells count as 0, like pandas' skipna sum)
+    counts = df.iloc[:, 1:].to_numpy()
+    df["sum_counts"] = np.nansum(counts, axis=1)
+    filtered = df[df["sum_counts"] > 50]
+    n_filtered = filtered.shape[0]
 
-print("\nFiltered genes:", filtered.shape[0])
+print("\nFiltered genes:", n_filtered)
 
 # Save filtered table
-filtered.to_csv("counts_filtered.csv", index=False)
+if HAVE_ARROW:
+    # Arrow's writer can't quote only where needed, nor print floats the way pandas does
+    needs_quotes = any(
+        pc.any(pc.match_substring_regex(col, r'[,"\r\n]')).as_py()
+        for col in filtered.columns if pa.types.is_string(col.type)
+    )
+    has_floats = any(pa.types.is_floating(col.type) for col in filtered.columns[1:])  # 10.0 vs 10
+    if has_floats or needs_quotes:
+        filtered.to_pandas().to_csv("counts_filtered.csv", index=False)
+    else:
+        # no quoting, so the file matches what pandas.to_csv writes
+        opts = pcsv.WriteOptions(quoting_style="none", quoting_header="none")
+        pcsv.write_csv(filtered, "counts_filtered.csv", write_options=opts)
+else:
+    filtered.to_csv("counts_filtered.csv", index=False)
 
 print("\nSaved: counts_filtered.csv")
@@ -1,13 +1,48 @@
 from pathlib import Path
 import gzip
+import io
+import shutil
+import signal
+import subprocess
+import numpy as np
 import pandas as pd
 
 # ---------------- FASTQ QC ----------------
 
-def open_maybe_gz(path: Path):
+# bytes read per chunk by fastq_qc
+BUF_BYTES = 1 << 20
+
+class PipeReader(io.BufferedReader):
+    """Binary stream over a child process's stdout; reaps the child on close and checks its exit status."""
+
+    def __init__(self, proc: subprocess.Popen):
+        super().__init__(proc.stdout.detach(), buffer_size=BUF_BYTES)
+        self.proc = proc
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        rc = self.proc.wait()
+        # -SIGPIPE only means we stopped reading early (e.g. max_reads); anything else is
+        # a corrupt or truncated file, which gzip.open would have raised on too
+        if rc and rc != -signal.SIGPIPE:
+            raise gzip.BadGzipFile(f"{' '.join(map(str, self.proc.args))} exited with status {rc}")
+
+def open_maybe_gz(path: Path, binary: bool = False):
     p = str(path)
     if p.endswith(".gz"):
+        # decompress in a separate process (pigz: multi-threaded, igzip: ISA-L) if installed
+        tool = shutil.which("pigz") or shutil.which("igzip")
+        if tool:
+            proc = subprocess.Popen([tool, "-dc", p], stdout=subprocess.PIPE, bufsize=BUF_BYTES)
+            f = PipeReader(proc)
+            return f if binary else io.TextIOWrapper(f, encoding="utf-8", errors="replace")
+        if binary:
+            return gzip.open(p, "rb")
         return gzip.open(p, "rt", encoding="utf-8", errors="replace")
+    if binary:
+        return open(p, "rb")
     return open(p, "r", encoding="utf-8", errors="replace")
 
 def fastq_qc(path: Path, max_reads: int = 200_000):
@@ -18,45 +53,64 @@ def fastq_qc(path: Path, max_reads: int = 200_000):
     if not path.exists():
         raise FileNotFoundError(f"FASTQ not found: {path}")
 
-    n = 0
-    lengths = []
-
-    with open_maybe_gz(path) as f:
-        while True:
-            h = f.readline()
-            if not h:
-                break
-            s = f.readline()
-            p = f.readline()
-            q = f.readline()
-            if not (s and p and q):
+    n = total = mx = 0
+    mn = 1 << 31
+    pending: list[bytes] = []  # lines of a record cut off by the chunk boundary
+    partial = b""  # last line of the chunk, no newline yet
+    crlf = False
+
+    # big binary chunks split in one C call; lengths via map(len, ...) over every 4th line
+    with open_maybe_gz(path, binary=True) as f:
+        while n < max_reads:
+            chunk = f.read(BUF_BYTES)
+            crlf = crlf or b"\r" in chunk
+            if chunk:
+                lines = (partial + chunk).split(b"\n")
+                partial = lines.pop()
+            else:
+                lines, partial = ([partial] if partial else []), b""
+            if pending:
+                lines[:0] = pending
+            k = min(len(lines) // 4, max_reads - n)
+            pending = lines[4 * k:]
+            if not chunk and pending and n + k < max_reads:
                 raise ValueError("FASTQ ended unexpectedly (incomplete record).")
 
-            # simple validation
-            if not h.startswith("@") or not p.startswith("+"):
-                raise ValueError(f"Invalid FASTQ record near header: {h.strip()[:80]}")
-            if len(s.strip()) != len(q.strip()):
-                raise ValueError(f"Seq/Qual length mismatch near header: {h.strip()[:80]}")
-
-            n += 1
-            lengths.append(len(s.strip()))
-            if n >= max_reads:
+            heads, seqs, plus, quals = (lines[i:4 * k:4] for i in range(4))
+            if crlf:  # CRLF line endings
+                seqs = [x.rstrip(b"\r") for x in seqs]
+                quals = [x.rstrip(b"\r") for x in quals]
+            seq_lens = list(map(len, seqs))
+            ok = (
+                all(h.startswith(b"@") for h in heads)
+                and all(p.startswith(b"+") for p in plus)
+                and seq_lens == list(map(len, quals))
+            )
+            if not ok:
+                for h, s, p, q in zip(heads, seqs, plus, quals):  # find the offending record
+                    hs = h.decode("utf-8", errors="replace").strip()[:80]
+                    if not h.startswith(b"@") or not p.startswith(b"+"):
+                        raise ValueError(f"Invalid FASTQ record near header: {hs}")
+                    if len(s) != len(q):
+                        raise ValueError(f"Seq/Qual length mismatch near header: {hs}")
+
+            if k:
+                n += k
+                total += sum(seq_lens)
+                mn = min(mn, min(seq_lens))
+                mx = max(mx, max(seq_lens))
+            if not chunk:
                 break
 
     if n == 0:
         raise ValueError("No reads found (empty FASTQ?)")
 
-    avg_len = sum(lengths) / n
-    return n, min(lengths), avg_len, max(lengths)
+    return n, mn, total / n, mx
 
 # ---------------- METADATA CLEAN ----------------
 
 REQUIRED_COLS = ["sample_id", "condition"]
 
-def clean_sample_id(s: str) -> str:
-    s = s.strip().replace(" ", "_").replace("-", "_")
-    return "".join(c for c in s if c.isalnum() or c == "_")
-
 def clean_metadata(in_csv: Path, out_csv: Path) -> int:
     if not in_csv.exists():
         raise FileNotFoundError(f"Metadata not found: {in_csv}")
@@ -67,7 +121,13 @@ def clean_metadata(in_csv: Path, out_csv: Path) -> int:
     if missing:
         raise ValueError(f"Missing required columns {missing}. Found: {list(df.columns)}")
 
-    df["sample_id"] = df["sample_id"].astype(str).apply(clean_sample_id)
+    # whole-column string ops: spaces/dashes -> "_", then drop anything not alnum or "_"
+    df["sample_id"] = (
+        df["sample_id"].astype(str)
+        .str.strip()
+        .str.replace(r"[ -]", "_", regex=True)
+        .str.replace(r"\W", "", regex=True)
+    )
 
     # check empty + duplicates after cleaning
     if (df["sample_id"] == "").any():
@@ -90,12 +150,14 @@ def filter_counts(count_csv: Path, out_csv: Path, min_sum: int = 50) -> int:
     if df.shape[1] < 2:
         raise ValueError("Counts table must have at least 2 columns: gene + >=1 sample")
 
-    # assume first col is gene ID, rest are samples
-    df["sum_counts"] = df.iloc[:, 1:].sum(axis=1)
-    filtered = df[df["sum_counts"] > min_sum].copy()
+    # assume first col is gene ID, rest are samples; one row-sum over the raw ndarray
+    # (nansum: empty cells count as 0, like pandas' skipna sum)
+    sums = np.nansum(df.iloc[:, 1:].to_numpy(), axis=1)
+    mask = sums > min_sum
+    df["sum_counts"] = sums
 
-    filtered.to_csv(out_csv, index=False)
-    return filtered.shape[0]
+    df[mask].to_csv(out_csv, index=False)
+    return int(mask.sum())
 
 # ---------------- PIPELINE ----------------
 
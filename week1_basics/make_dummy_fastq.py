@@ -1,18 +1,25 @@
-import random
+import numpy as np
 
-def rand_seq(n):
-    return "".join(random.choice("ACGT") for _ in range(n))
+BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+def rand_seqs(rng, n_reads, read_len):
+    # all bases in one RNG call, mapped to ASCII by indexing into the lookup table
+    codes = rng.integers(0, 4, size=n_reads * read_len, dtype=np.uint8)
+    return BASES[codes].tobytes()
 
 def main():
     out = "sample.fastq"
     n_reads = 20
     read_len = 75
 
-    with open(out, "w", encoding="utf-8") as f:
+    rng = np.random.default_rng(0)
+    buf = rand_seqs(rng, n_reads, read_len)
+    qual = b"I" * read_len  # dummy high-quality Phred33
+
+    with open(out, "wb") as f:
         for i in range(n_reads):
-            seq = rand_seq(read_len)
-            qual = "I" * read_len  # dummy high-quality Phred33
-            f.write(f"@read{i}\n{seq}\n+\n{qual}\n")
+            seq = buf[i * read_len:(i + 1) * read_len]
+            f.write(b"@read%d\n%s\n+\n%s\n" % (i, seq, qual))
 
     print(f"Created {out} with {n_reads} reads of length {read_len}")
 
@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+from joblib import Memory  # ships with scikit-learn
+from sklearn.decomposition import PCA
+
+from _counts import load_counts
+
+# results persist on disk, so day10 and day11 (and reruns) share one PCA fit
+mem = Memory(location=".pca_cache", verbose=0)
+
+
+@mem.cache
+def _compute_pca(counts_path: str, mtime_ns: int, size: int):
+    # mtime_ns/size are only part of the cache key: editing the file invalidates the entry
+    counts, sample_cols = load_counts(counts_path)
+
+    A = counts[sample_cols].to_numpy(dtype=np.float32)  # genes x samples, as stored
+
+    # Scale before PCA (same as StandardScaler: per gene, ddof=0, constant genes left at 0);
+    # reductions run along axis=1 so the table is never transposed into a copy
+    mu = A.mean(axis=1, keepdims=True)
+    sd = A.std(axis=1, keepdims=True)
+    sd[sd == 0] = 1.0
+    X_scaled = ((A - mu) / sd).T  # samples x genes, a view
+
+    # randomized SVD: only the top 2 components of a wide samples x genes matrix are needed
+    pca = PCA(n_components=2, svd_solver="randomized", random_state=0, copy=False)
+    pcs = pca.fit_transform(X_scaled)
+    return pcs, pca.explained_variance_ratio_, list(sample_cols)
+
+
+def compute_pca(counts_path: str = "counts.csv"):
+    """
+    Load counts -> standardise genes -> 2-component PCA of the samples.
+    Returns (pcs, explained_variance_ratio, sample_cols).
+    """
+    st = os.stat(counts_path)
+    return _compute_pca(counts_path, st.st_mtime_ns, st.st_size)
@@ -0,0 +1,24 @@
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (pandas' multi-threaded CSV engine)
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+
+def load_counts(path: str = "counts.csv"):
+    """
+    Load a genes x samples count table: first column gene ID, the rest integer counts.
+    Returns (counts, sample_cols).
+    """
+    # header first, so the gene column parses as string and every sample column straight to int32
+    header = pd.read_csv(path, nrows=0).columns
+    gene_col = header[0]
+    sample_cols = header[1:]
+    counts = pd.read_csv(
+        path,
+        dtype={gene_col: "string", **{c: "int32" for c in sample_cols}},
+        engine=CSV_ENGINE,
+    )
+    return counts, sample_cols
@@ -0,0 +1,29 @@
+import pandas as pd
+
+
+def load_meta(path: str = "metadata_clean.csv", columns=("condition",)):
+    """
+    Load sample metadata keyed by a 'sample' column (Week 1 files use 'sample_id').
+    Only the id plus `columns` are parsed (None keeps every column); condition is read as category.
+    """
+    # header first, so we know the id column and can validate before parsing any rows
+    header = pd.read_csv(path, nrows=0).columns
+    if "sample" in header:
+        id_col = "sample"
+    elif "sample_id" in header:
+        id_col = "sample_id"
+    else:
+        raise ValueError(f"{path} must contain a 'sample' or 'sample_id' column. Found: {list(header)}")
+
+    if columns is None:
+        columns = [c for c in header if c != id_col]
+    missing = set(columns) - set(header)
+    if missing:
+        raise ValueError(f"{path} missing columns: {missing}. Found: {list(header)}")
+
+    dtype = {id_col: "string"}
+    if "condition" in columns:
+        dtype["condition"] = "category"
+
+    meta = pd.read_csv(path, usecols=[id_col, *columns], dtype=dtype)
+    return meta.rename(columns={id_col: "sample"})
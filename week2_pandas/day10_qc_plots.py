@@ -1,50 +1,44 @@
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # headless: files only, no GUI backend probe
 import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
+
+from _cache import compute_pca
 
 # ----------------------------
 # Load QC metrics
 # ----------------------------
 qc = pd.read_csv("qc_metrics_per_sample.csv")
 
+# one figure for all three plots; the axes are cleared between them
+fig, ax = plt.subplots()
+
 # ----------------------------
 # Histogram: Library size
 # ----------------------------
-plt.figure()
-plt.hist(qc["library_size"], bins=10)
-plt.xlabel("Library size")
-plt.ylabel("Number of samples")
-plt.title("Library Size Distribution")
-plt.tight_layout()
-plt.savefig("qc_library_size_hist.png")
-plt.close()
+ax.hist(qc["library_size"], bins=10)
+ax.set_xlabel("Library size")
+ax.set_ylabel("Number of samples")
+ax.set_title("Library Size Distribution")
+fig.tight_layout()
+fig.savefig("qc_library_size_hist.png")
+ax.cla()
 
 # ----------------------------
 # Boxplot: Detection rate
 # ----------------------------
-plt.figure()
-plt.boxplot(qc["detection_rate"], vert=False)
-plt.xlabel("Detection rate")
-plt.title("Gene Detection Rate")
-plt.tight_layout()
-plt.savefig("qc_detection_rate_boxplot.png")
-plt.close()
+ax.boxplot(qc["detection_rate"], vert=False)
+ax.set_xlabel("Detection rate")
+ax.set_title("Gene Detection Rate")
+fig.tight_layout()
+fig.savefig("qc_detection_rate_boxplot.png")
+ax.cla()
 
 # ----------------------------
 # PCA on counts
 # ----------------------------
-counts = pd.read_csv("counts.csv")
-gene_col = counts.columns[0]
-sample_cols = counts.columns[1:]
-
-X = counts[sample_cols].T  # samples x genes
-
-# Scale before PCA
-X_scaled = StandardScaler().fit_transform(X)
-
-pca = PCA(n_components=2)
-pcs = pca.fit_transform(X_scaled)
+# load -> scale -> PCA, cached on disk by counts.csv mtime/size (see _cache.py)
+pcs, evr, sample_cols = compute_pca("counts.csv")
 
 pca_df = pd.DataFrame(
     pcs, columns=["PC1", "PC2"]
@@ -54,18 +48,17 @@ pca_df["sample"] = sample_cols
 pca_df = pca_df.merge(qc[["sample", "condition"]], on="sample", how="left")
 
 # Plot PCA
-plt.figure()
 for cond in pca_df["condition"].unique():
     sub = pca_df[pca_df["condition"] == cond]
-    plt.scatter(sub["PC1"], sub["PC2"], label=cond)
+    ax.scatter(sub["PC1"], sub["PC2"], label=cond)
 
-plt.xlabel(f"PC1 ({pca.explained_variance_ratio_[0]*100:.1f}%)")
-plt.ylabel(f"PC2 ({pca.explained_variance_ratio_[1]*100:.1f}%)")
-plt.title("PCA of Samples (Counts)")
-plt.legend()
-plt.tight_layout()
-plt.savefig("qc_pca_samples.png")
-plt.close()
+ax.set_xlabel(f"PC1 ({evr[0]*100:.1f}%)")
+ax.set_ylabel(f"PC2 ({evr[1]*100:.1f}%)")
+ax.set_title("PCA of Samples (Counts)")
+ax.legend()
+fig.tight_layout()
+fig.savefig("qc_pca_samples.png")
+plt.close(fig)
 
 print("Saved plots:")
 print("- qc_library_size_hist.png")
@@ -1,17 +1,17 @@
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # headless: files only, no GUI backend probe
 import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
 import numpy as np
 
+from _cache import compute_pca
+
+MAX_LABELS = 200  # annotate sample names only up to this many samples
+
 # ----------------------------
 # Load inputs
 # ----------------------------
 qc = pd.read_csv("qc_metrics_per_sample.csv")
-counts = pd.read_csv("counts.csv")
-
-gene_col = counts.columns[0]
-sample_cols = counts.columns[1:]
 
 # Ensure metadata merge works
 if "sample" not in qc.columns:
@@ -20,19 +20,16 @@ if "sample" not in qc.columns:
 # ----------------------------
 # PCA
 # ----------------------------
-X = counts[sample_cols].T  # samples x genes
-X_scaled = StandardScaler().fit_transform(X)
-
-pca = PCA(n_components=2)
-pcs = pca.fit_transform(X_scaled)
+# load -> scale -> PCA, cached on disk by counts.csv mtime/size (see _cache.py)
+pcs, evr, sample_cols = compute_pca("counts.csv")
 
 pca_df = pd.DataFrame(pcs, columns=["PC1", "PC2"])
 pca_df["sample"] = sample_cols
 pca_df = pca_df.merge(qc[["sample", "condition", "library_size", "detection_rate"]], on="sample", how="left")
 
 # Save explained variance
-var1 = pca.explained_variance_ratio_[0] * 100
-var2 = pca.explained_variance_ratio_[1] * 100
+var1 = evr[0] * 100
+var2 = evr[1] * 100
 
 with open("pca_explained_variance.txt", "w") as f:
     f.write(f"PC1: {var1:.2f}%\n")
@@ -42,11 +39,13 @@ with open("pca_explained_variance.txt", "w") as f:
 # Outlier detection in PC space (robust-ish)
 # rule: distance from centroid > mean + 2*std
 # ----------------------------
-centroid = pca_df[["PC1", "PC2"]].mean().values
-dist = np.sqrt(((pca_df[["PC1","PC2"]].values - centroid) ** 2).sum(axis=1))
+pts = pca_df[["PC1", "PC2"]].to_numpy()
+centroid = pts.mean(axis=0)
+dist = np.linalg.norm(pts - centroid, axis=1)
 pca_df["pc_distance"] = dist
 
-thr = dist.mean() + 2 * dist.std()
+mu, sd = dist.mean(), dist.std()
+thr = mu + 2 * sd
 pca_df["flag_outlier"] = pca_df["pc_distance"] > thr
 
 outliers = pca_df[pca_df["flag_outlier"]].copy()
@@ -66,9 +65,10 @@ missing = pca_df[pca_df["condition"].isna()]
 if len(missing) > 0:
     plt.scatter(missing["PC1"], missing["PC2"], label="missing_condition")
 
-# annotate sample names
-for _, row in pca_df.iterrows():
-    plt.text(row["PC1"], row["PC2"], str(row["sample"]), fontsize=8)
+# annotate sample names (skipped for large cohorts, where labels are unreadable anyway)
+if len(pca_df) <= MAX_LABELS:
+    for row in pca_df[["PC1", "PC2", "sample"]].itertuples(index=False):
+        plt.text(row.PC1, row.PC2, str(row.sample), fontsize=8)
 
 # highlight outliers
 if len(outliers) > 0:
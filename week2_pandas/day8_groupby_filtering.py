@@ -1,9 +1,14 @@
+import numpy as np
 import pandas as pd
 
+from _counts import load_counts
+from _meta import load_meta
+
 # ----------------------------
 # Load RNA-seq count table
 # ----------------------------
-counts = pd.read_csv("counts.csv")
+# gene column as string, sample columns as int32 (see _counts.py)
+counts, sample_cols = load_counts("counts.csv")
 
 print("\nCounts shape:", counts.shape)
 print(counts.head())
@@ -11,10 +16,11 @@ print(counts.head())
 # ----------------------------
 # Sample-wise library size
 # ----------------------------
-# sums each sample column (all columns except gene)
-lib_sizes = counts.iloc[:, 1:].sum()
-lib_sizes = lib_sizes.reset_index()
-lib_sizes.columns = ["sample", "library_size"]
+# one ndarray of the sample columns (all columns except gene), reused by both steps below
+arr = counts[sample_cols].to_numpy()
+
+# sums each sample column in one C loop
+lib_sizes = pd.DataFrame({"sample": sample_cols, "library_size": arr.sum(axis=0, dtype=np.int64)})
 
 print("\nLibrary sizes:")
 print(lib_sizes)
@@ -25,8 +31,8 @@ lib_sizes.to_csv("qc_library_sizes.csv", index=False)
 # Gene-wise filtering
 # Rule: expressed (count > 5) in at least 2 samples
 # ----------------------------
-expr_mask = (counts.iloc[:, 1:] > 5).sum(axis=1) >= 2
-filtered = counts.loc[expr_mask].copy()
+expr_mask = (arr > 5).sum(axis=1) >= 2
+filtered = counts[expr_mask]
 
 print("\nGenes before filtering:", counts.shape[0])
 print("Genes after filtering:", filtered.shape[0])
@@ -36,39 +42,45 @@ filtered.to_csv("counts_expr_filtered.csv", index=False)
 # ----------------------------
 # Grouped aggregation (mean per condition)
 # ----------------------------
-meta = pd.read_csv("metadata_clean.csv")
-
-# Your Week 1 metadata likely uses "sample_id"
-if "sample" not in meta.columns and "sample_id" in meta.columns:
-    meta = meta.rename(columns={"sample_id": "sample"})
-
-required = {"sample", "condition"}
-missing = required - set(meta.columns)
-if missing:
-    raise ValueError(f"metadata_clean.csv missing columns: {missing}. Found: {list(meta.columns)}")
-
-# reshape counts to long format: gene, sample, count
-long = filtered.melt(id_vars="gene", var_name="sample", value_name="count")
-
-# merge metadata
-merged = long.merge(meta, on="sample", how="left")
+# only sample + condition are parsed ("sample_id" from Week 1 is renamed; see _meta.py)
+meta = load_meta("metadata_clean.csv")
+
+# sample -> condition, then one row-mean per condition straight on the wide table
+# (no gene x sample long table, no merge)
+cond_map = dict(zip(meta["sample"], meta["condition"]))
+
+# condition -> column positions in arr
+groups = {}
+bad_samples = []
+for j, s in enumerate(sample_cols):
+    c = cond_map.get(s)
+    if pd.isna(c):
+        bad_samples.append(s)
+    else:
+        groups.setdefault(c, []).append(j)
 
 # IMPORTANT: detect samples in counts that are not in metadata
-n_missing_cond = merged["condition"].isna().sum()
-if n_missing_cond > 0:
-    # show which samples failed to merge (usually naming mismatch)
-    bad_samples = merged.loc[merged["condition"].isna(), "sample"].unique()
+if bad_samples:
+    # usually a naming mismatch
     print("\nWARNING: Some samples from counts.csv are missing in metadata_clean.csv")
-    print("Missing samples:", list(bad_samples))
+    print("Missing samples:", bad_samples)
     print("These rows will be excluded from group aggregation.\n")
 
-# drop rows without condition for grouping
-merged_ok = merged.dropna(subset=["condition"])
+# filtered rows of the same ndarray, sliced per condition (no DataFrame column lookups)
+arr_f = arr[expr_mask]
+means = pd.DataFrame(
+    {c: arr_f[:, idx].mean(axis=1) for c, idx in groups.items()},
+    index=filtered["gene"],
+)
 
+# long form (gene, condition, count) to keep the CSV layout
 grouped = (
-    merged_ok
-    .groupby(["gene", "condition"], as_index=False)["count"]
-    .mean()
+    means
+    .rename_axis(columns="condition")
+    .stack()
+    .rename("count")
+    .reset_index()
+    .sort_values(["gene", "condition"], ignore_index=True)
 )
 
 print("\nGrouped means:")
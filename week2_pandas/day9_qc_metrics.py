@@ -1,40 +1,65 @@
+import numpy as np
 import pandas as pd
 
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+from _counts import load_counts
+from _meta import load_meta
+
+
 # ----------------------------
-# Load data
+# Per-sample reductions: library size, detected genes (>0), low-count genes (<=1)
 # ----------------------------
-counts = pd.read_csv("counts.csv")
-
-gene_col = counts.columns[0]
-sample_cols = counts.columns[1:]
+if HAVE_NUMBA:
+    @njit(parallel=True, cache=True)
+    def qc_reduce(A):
+        # one pass over each sample column, all three counters at once
+        n, m = A.shape
+        lib = np.zeros(m, np.int64)  # int32 counts, int64 totals
+        det = np.zeros(m, np.int64)
+        low = np.zeros(m, np.int64)
+        for j in prange(m):
+            for i in range(n):
+                v = A[i, j]
+                lib[j] += v
+                det[j] += v > 0
+                low[j] += v <= 1
+        return lib, det, low
+else:
+    def qc_reduce(A):
+        return A.sum(axis=0), (A > 0).sum(axis=0), (A <= 1).sum(axis=0)
 
-meta = pd.read_csv("metadata_clean.csv")
 
-# Normalize metadata sample column name
-if "sample" not in meta.columns and "sample_id" in meta.columns:
-    meta = meta.rename(columns={"sample_id": "sample"})
+# ----------------------------
+# Load data
+# ----------------------------
+# gene column as string, sample columns as int32 (see _counts.py)
+counts, sample_cols = load_counts("counts.csv")
 
-if "sample" not in meta.columns:
-    raise ValueError("metadata_clean.csv must contain a 'sample' or 'sample_id' column")
+# every metadata column is carried into the QC table ("sample_id" from Week 1 is renamed; see _meta.py)
+meta = load_meta("metadata_clean.csv", columns=None)
 
 # ----------------------------
 # QC metrics per sample
 # ----------------------------
-library_size = counts[sample_cols].sum(axis=0)
-detected_genes = (counts[sample_cols] > 0).sum(axis=0)
+# pull the count matrix out once; all three metrics come from one pass over it
+A = counts[sample_cols].to_numpy()
+library_size, detected_genes, low_count_genes = qc_reduce(A)
 
 total_genes = counts.shape[0]
 detection_rate = detected_genes / total_genes
-
-low_count_genes = (counts[sample_cols] <= 1).sum(axis=0)
 low_count_rate = low_count_genes / total_genes
 
 qc = pd.DataFrame({
     "sample": sample_cols,
-    "library_size": library_size.values,
-    "detected_genes": detected_genes.values,
-    "detection_rate": detection_rate.values,
-    "low_count_rate": low_count_rate.values
+    "library_size": library_size,
+    "detected_genes": detected_genes,
+    "detection_rate": detection_rate,
+    "low_count_rate": low_count_rate
 })
 
 # Add metadata columns if available
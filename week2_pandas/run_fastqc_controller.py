@@ -1,5 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import csv
+import os
+import shutil
 import subprocess
+import threading
 from datetime import datetime
 
 # SAFE default for shared lab server:
@@ -9,10 +14,21 @@ WORKDIR = Path(".").resolve()
 SAMPLE_FILE = WORKDIR / "sample_run1.txt"
 QC_DIR = WORKDIR / "run" / "01_seq_qc"
 SUMMARY_TSV = QC_DIR / "fastqc_run_summary.tsv"
+MULTIQC_LIST = QC_DIR / "multiqc_file_list.txt"
+
+# samples run side by side, THREADS cores each
+WORKERS = max(1, (os.cpu_count() or 1) // THREADS)
+
+# samples per fastqc call: one JVM start per batch instead of per sample
+BATCH_SAMPLES = 16
+
+# log lines from concurrent samples must not interleave mid-line
+_log_lock = threading.Lock()
 
 def log(msg: str) -> None:
     ts = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-    print(ts, msg, flush=True)
+    with _log_lock:
+        print(ts, msg, flush=True)
 
 def run(cmd) -> None:
     log("RUN: " + " ".join(map(str, cmd)))
@@ -33,67 +49,130 @@ def parse_sample_file(path: Path):
             sample, r1, r2 = parts
             yield sample, Path(r1), Path(r2)
 
+def fastqc_outputs(fq: Path) -> list:
+    """Report names FastQC derives from an input file (it strips these suffixes in order)."""
+    name = fq.name
+    for suffix in (".gz", ".bz2", ".txt", ".fastq", ".fq", ".csfastq", ".sam", ".bam"):
+        name = name.removesuffix(suffix)
+    return [f"{name}_fastqc.zip", f"{name}_fastqc.html"]
+
+def make_batches(samples: list) -> list:
+    """Split (sample, r1, r2) into batches; file names must be unique within a batch."""
+    batches, batch, names = [], [], set()
+    for item in samples:
+        outs = fastqc_outputs(item[1]) + fastqc_outputs(item[2])
+        if len(batch) == BATCH_SAMPLES or names.intersection(outs) or len(set(outs)) < 4:
+            if batch:
+                batches.append(batch)
+            batch, names = [], set()
+        batch.append(item)
+        names.update(outs)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _run_batch(k: int, batch: list, threads: int) -> list:
+    """One fastqc call for a batch of samples; returns their summary rows."""
+    # -o is one folder per call: write to a scratch folder, then sort reports into QC_DIR/<sample>
+    tmp = QC_DIR / f".fastqc_batch{k}"
+    shutil.rmtree(tmp, ignore_errors=True)  # leftovers of an interrupted run must not count as output
+    tmp.mkdir(parents=True)
+
+    files = [str(p) for _, r1, r2 in batch for p in (r1, r2)]
+    error = ""
+    try:
+        log("FastQC: " + ", ".join(sample for sample, _, _ in batch))
+        run(["fastqc"] + files + ["-t", str(threads), "-o", str(tmp)])
+    except subprocess.CalledProcessError as e:
+        error = f"fastqc exit {e.returncode}"
+
+    rows = []
+    for sample, r1_path, r2_path in batch:
+        outdir = QC_DIR / sample
+        outs = fastqc_outputs(r1_path) + fastqc_outputs(r2_path)
+        # judged on this run's scratch folder, so stale reports in outdir can't pass
+        ok = all((tmp / name).exists() for name in outs if name.endswith(".zip"))
+        for name in outs:
+            if (tmp / name).exists():
+                shutil.move(str(tmp / name), str(outdir / name))
+
+        if ok:
+            rows.append((sample, str(r1_path), str(r2_path), "OK", ""))
+        else:
+            reason = error or "FastQC output missing"
+            log(f"[FAIL] {sample}: {reason}")
+            rows.append((sample, str(r1_path), str(r2_path), "FAIL", reason))
+
+    shutil.rmtree(tmp, ignore_errors=True)
+    return rows
+
 def main():
     if not SAMPLE_FILE.exists():
         raise FileNotFoundError(f"Not found: {SAMPLE_FILE}")
 
     QC_DIR.mkdir(parents=True, exist_ok=True)
 
-    rows = []
-    failures = 0
-
     log(f"WORKDIR: {WORKDIR}")
     log(f"THREADS: {THREADS}")
+    log(f"WORKERS: {WORKERS}")
     log("Starting FastQC batch...")
 
+    rows = []
+    pending = []  # (row index, (sample, r1, r2)) for samples whose inputs exist
     for sample, r1, r2 in parse_sample_file(SAMPLE_FILE):
-        outdir = QC_DIR / sample
-        outdir.mkdir(parents=True, exist_ok=True)
-
         # Inputs are filenames relative to WORKDIR (same folder)
         r1_path = WORKDIR / r1
         r2_path = WORKDIR / r2
+        (QC_DIR / sample).mkdir(parents=True, exist_ok=True)
 
         if not r1_path.exists():
             reason = f"Missing R1: {r1_path}"
-            log(f"[FAIL] {sample}: {reason}")
-            rows.append((sample, str(r1_path), str(r2_path), "FAIL", reason))
-            failures += 1
-            continue
-
-        if not r2_path.exists():
+        elif not r2_path.exists():
             reason = f"Missing R2: {r2_path}"
-            log(f"[FAIL] {sample}: {reason}")
-            rows.append((sample, str(r1_path), str(r2_path), "FAIL", reason))
-            failures += 1
+        else:
+            pending.append((len(rows), (sample, r1_path, r2_path)))
+            rows.append(None)
             continue
-
-        try:
-            log(f"FastQC: {sample}")
-            run([
-                "fastqc",
-                str(r1_path), str(r2_path),
-                "-t", str(THREADS),
-                "-o", str(outdir)
-            ])
-            rows.append((sample, str(r1_path), str(r2_path), "OK", ""))
-        except subprocess.CalledProcessError as e:
-            reason = f"fastqc exit {e.returncode}"
-            log(f"[FAIL] {sample}: {reason}")
-            rows.append((sample, str(r1_path), str(r2_path), "FAIL", reason))
-            failures += 1
+        log(f"[FAIL] {sample}: {reason}")
+        rows.append((sample, str(r1_path), str(r2_path), "FAIL", reason))
+
+    # batches run side by side and share the WORKERS * THREADS core budget;
+    # fastqc is an external process, so threads are enough to drive them
+    batches = make_batches([item for _, item in pending])
+    parallel = max(1, min(WORKERS, len(batches)))
+    with ThreadPoolExecutor(max_workers=parallel) as ex:
+        futs = [
+            ex.submit(_run_batch, k, batch, max(1, min(2 * len(batch), WORKERS * THREADS // parallel)))
+            for k, batch in enumerate(batches)
+        ]
+        batch_rows = [row for f in futs for row in f.result()]
+    # rows keep sample-file order
+    for (idx, _), row in zip(pending, batch_rows):
+        rows[idx] = row
+    failures = sum(r[3] == "FAIL" for r in rows)
 
     # Write summary TSV
-    with open(SUMMARY_TSV, "w", encoding="utf-8") as f:
-        f.write("sample\tr1\tr2\tstatus\tnote\n")
-        for r in rows:
-            f.write("\t".join(r) + "\n")
+    # csv.writer quotes any field containing a tab/newline instead of corrupting the row
+    with open(SUMMARY_TSV, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, delimiter="\t", lineterminator="\n")
+        w.writerow(("sample", "r1", "r2", "status", "note"))
+        w.writerows(rows)
 
     log(f"Saved summary: {SUMMARY_TSV}")
 
-    # MultiQC once (aggregates all FastQC outputs)
-    log("Running MultiQC...")
-    run(["multiqc", str(QC_DIR), "--force", "-o", str(QC_DIR), "-n", "01_report.html"])
+    # MultiQC once, over this run's FastQC reports only: an explicit file list
+    # instead of a recursive walk of QC_DIR and whatever earlier runs left there
+    zips = [
+        str(QC_DIR / sample / name)
+        for sample, r1, r2, status, _ in rows if status == "OK"
+        for name in fastqc_outputs(Path(r1)) + fastqc_outputs(Path(r2)) if name.endswith(".zip")
+    ]
+    if zips:
+        MULTIQC_LIST.write_text("\n".join(zips) + "\n", encoding="utf-8")
+        log("Running MultiQC...")
+        run(["multiqc", "--file-list", str(MULTIQC_LIST), "--force", "-o", str(QC_DIR), "-n", "01_report.html"])
+    else:
+        log("No FastQC reports from this run; skipping MultiQC")
 
     if failures:
         log(f"DONE with failures: {failures}. See {SUMMARY_TSV}")